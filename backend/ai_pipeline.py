@@ -1,11 +1,11 @@
 import os
 import json
 import sys
+import time
+import threading
 import requests
 from datetime import datetime, UTC
 from typing import List, Dict, Any
-import firebase_admin
-from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
 import http.client
 import urllib.parse
@@ -14,28 +14,29 @@ from transformers import pipeline
 from sentence_transformers import SentenceTransformer, util
 import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
+from orchestration import (
+    order_topics_for_delivery,
+    TopicCompletionTracker,
+    run_topic_events,
+    time_to_inbox_report,
+)
+from dedupe import ArticleDeduplicator
+from download_policy import DownloadPolicy, DownloadBudget
+from ranking import ArticleRanker, RankedArticles
+from storage import open_storage
 
 # Load environment variables
 load_dotenv()
 
-# --- Firebase Initialization ---
+# --- Storage Initialization ---
+# Firestore by default; STORAGE_BACKEND=sqlite runs against a local file without credentials
 try:
-    service_account_key = os.getenv('FIREBASE_SERVICE_ACCOUNT_KEY')
-    if service_account_key:
-        cred_dict = json.loads(service_account_key)
-        cred = credentials.Certificate(cred_dict)
-        firebase_admin.initialize_app(cred)
-        print("Firebase initialized with environment variable")
-    else:
-        firebase_admin.initialize_app()
-        print("Firebase initialized with default credentials")
+    storage = open_storage()
 except Exception as e:
-    print(f"Firebase initialization failed: {e}")
-    print("Please set FIREBASE_SERVICE_ACCOUNT_KEY in your .env file")
+    print(f"Storage initialization failed: {e}")
+    print("Please set FIREBASE_SERVICE_ACCOUNT_KEY in your .env file, or use STORAGE_BACKEND=sqlite")
     sys.exit(1)
 
-db = firestore.client()
-
 # --- Summarization Model Initialization ---
 print("Loading summarization model...")
 try:
@@ -54,6 +55,15 @@ except Exception as e:
     print(f"Failed to load sentence similarity model: {e}")
     sys.exit(1)
 
+# The event-driven mode encodes from the topic worker and the main thread, and the
+# model's fast tokenizer is not safe for concurrent calls ("Already borrowed").
+similarity_model_lock = threading.Lock()
+
+def encode_text(texts, **kwargs):
+    """Thread-safe similarity_model.encode."""
+    with similarity_model_lock:
+        return similarity_model.encode(texts, **kwargs)
+
 # --- News Fetching ---
 def fetch_articles_for_topic(topic: str, api_token: str) -> List[Dict[str, Any]]:
     """Fetches news articles for a given topic from the API."""
@@ -105,7 +115,7 @@ def is_duplicate(topic: str, article_text: str, threshold: float = 0.95) -> bool
     if topic not in processed_articles_embeddings:
         processed_articles_embeddings[topic] = []
 
-    new_article_embedding = similarity_model.encode(article_text, convert_to_tensor=True)
+    new_article_embedding = encode_text(article_text, convert_to_tensor=True)
 
     for existing_embedding in processed_articles_embeddings[topic]:
         similarity = util.pytorch_cos_sim(new_article_embedding, existing_embedding)
@@ -116,17 +126,31 @@ def is_duplicate(topic: str, article_text: str, threshold: float = 0.95) -> bool
     processed_articles_embeddings[topic].append(new_article_embedding)
     return False
 
+# --- Article Ranking ---
+NEWSLETTER_MAX_ARTICLES = int(os.getenv('NEWSLETTER_MAX_ARTICLES', '10'))
+
+def create_article_ranker() -> ArticleRanker:
+    """Ranker over the day's summaries, embedded with the sentence similarity model."""
+    return ArticleRanker(lambda texts: encode_text(texts, convert_to_numpy=True))
+
+# --- Article Downloads ---
+# Per-article timeout, per-topic download time budget, per-domain circuit breakers and hedged requests
+ARTICLE_DOWNLOAD_TIMEOUT = float(os.getenv('ARTICLE_DOWNLOAD_TIMEOUT', '10'))
+DOWNLOAD_STAGE_BUDGET = float(os.getenv('DOWNLOAD_STAGE_BUDGET', '60'))
+download_policy = DownloadPolicy(article_timeout=ARTICLE_DOWNLOAD_TIMEOUT)
+
 # --- Article Summarization ---
-def summarize_article(article_data: Dict[str, Any], topic: str) -> Dict[str, Any] | None:
-    """Summarizes a single article."""
+def summarize_article(article_data: Dict[str, Any], topic: str, budget: DownloadBudget | None = None) -> Dict[str, Any] | None:
+    """Summarizes a single article. The download is charged to `budget` (see DownloadPolicy.fetch)."""
     url = article_data.get("url")
     if not url:
         return None
 
     print(f"  Processing article: {url[:70]}...")
     try:
+        html = download_policy.fetch(url, budget)
         article = Article(url)
-        article.download()
+        article.download(input_html=html)
         article.parse()
         text = article.text
         
@@ -150,39 +174,28 @@ def summarize_article(article_data: Dict[str, Any], topic: str) -> Dict[str, Any
         print(f"    Failed to process article {url}: {e}")
         return None
 
-# --- Firestore Operations ---
+# --- Storage Operations ---
 def store_summaries(topic: str, summaries: List[Dict[str, Any]]) -> None:
-    """Stores summaries for a topic in Firestore."""
+    """Stores summaries for a topic."""
     if not summaries:
         print(f"No summaries to store for {topic}")
         return
         
     today = datetime.now(UTC).date()
     try:
-        doc_ref = db.collection('summaries').document(f"{topic}_{today.isoformat()}")
-        doc_ref.set({
-            'topic': topic,
-            'date': today.isoformat(),
-            'summaries': summaries,
-            'count': len(summaries),
-            'created_at': firestore.SERVER_TIMESTAMP
-        })
-        print(f"Stored {len(summaries)} summaries for {topic} in Firestore.")
+        storage.put_summaries(topic, today.isoformat(), summaries)
+        print(f"Stored {len(summaries)} summaries for {topic}.")
     except Exception as e:
         print(f"Failed to store summaries for {topic}: {e}")
 
 def get_user_preferences() -> Dict[str, List[str]]:
-    """Gets all users and their topic preferences from Firestore."""
+    """Gets all users and their topic preferences."""
     try:
-        users_ref = db.collection('users')
-        users = users_ref.stream()
-        
         user_preferences = {}
-        for user in users:
-            user_data = user.to_dict()
+        for user_id, user_data in storage.get_users().items():
             topics = user_data.get('topics', [])
             if topics:
-                user_preferences[user.id] = topics
+                user_preferences[user_id] = topics
         
         print(f"Retrieved preferences for {len(user_preferences)} users.")
         return user_preferences
@@ -190,49 +203,40 @@ def get_user_preferences() -> Dict[str, List[str]]:
         print(f"Failed to get user preferences: {e}")
         return {}
 
-def create_personalized_newsletter(user_id: str, user_topics: List[str]) -> Dict[str, Any]:
-    """Creates a personalized newsletter for a specific user, including only their selected topics."""
+def create_ranked_newsletter(user_id: str, ranked_articles: RankedArticles) -> Dict[str, Any]:
+    """
+    Creates a newsletter from a user's ranked (topic, summary) pairs.
+    Sections follow the rank of their best article, and articles keep their rank within a section.
+    """
     today = datetime.now(UTC).date()
-    newsletter_content = {
+    sections = {}
+    for topic, summary in ranked_articles:
+        sections.setdefault(topic, []).append(summary)
+    return {
         'user_id': user_id,
         'date': today.isoformat(),
-        'sections': [],
-        'total_articles': 0
+        'sections': [{'topic': topic, 'articles': articles} for topic, articles in sections.items()],
+        'total_articles': len(ranked_articles)
     }
-    for topic in user_topics:  # Only loop over the user's selected topics
-        try:
-            doc_ref = db.collection('summaries').document(f"{topic}_{today.isoformat()}")
-            doc = doc_ref.get()
-            if doc.exists:
-                data = doc.to_dict()
-                summaries = data.get('summaries', [])
-                if summaries:
-                    newsletter_content['sections'].append({
-                        'topic': topic,
-                        'articles': summaries
-                    })
-                    newsletter_content['total_articles'] += len(summaries)
-        except Exception as e:
-            print(f"Failed to get summaries for topic {topic}: {e}")
-    return newsletter_content
 
-def store_newsletters_in_firestore(newsletters: Dict[str, Dict[str, Any]]) -> None:
-    """Stores personalized newsletters in Firestore."""
+def get_delivered_users() -> set:
+    """Returns the users whose newsletter for today is already marked delivered, so a rerun skips them."""
     today = datetime.now(UTC).date()
-    
-    for user_id, newsletter in newsletters.items():
-        try:
-            doc_ref = db.collection('newsletters').document(f"{user_id}_{today.isoformat()}")
-            doc_ref.set({
-                'user_id': user_id,
-                'date': today.isoformat(),
-                'content': newsletter,
-                'created_at': firestore.SERVER_TIMESTAMP,
-                'delivered': False
-            })
+    try:
+        return {user_id for user_id, delivered in storage.get_delivery_status(today.isoformat()).items() if delivered}
+    except Exception as e:
+        print(f"Failed to get delivery status: {e}")
+        return set()
+
+def store_newsletters(newsletters: Dict[str, Dict[str, Any]]) -> None:
+    """Stores personalized newsletters in one bulk write."""
+    today = datetime.now(UTC).date()
+    try:
+        storage.put_newsletters_bulk(today.isoformat(), newsletters)
+        for user_id, newsletter in newsletters.items():
             print(f"Stored newsletter for user {user_id} with {newsletter['total_articles']} articles.")
-        except Exception as e:
-            print(f"Failed to store newsletter for user {user_id}: {e}")
+    except Exception as e:
+        print(f"Failed to store newsletters for {len(newsletters)} users: {e}")
 
 # Remove Mailgun environment variables
 # Add Brevo environment variables
@@ -401,27 +405,163 @@ def render_newsletter_html(newsletter, compatibility_mode=False):
 </body></html>'''
         return html
 
-def create_and_send_newsletters(newsletters: Dict[str, Dict[str, Any]]):
+def mark_delivered(user_ids: List[str]) -> None:
+    """Flags today's newsletters as delivered, logging rather than raising on failure."""
     today = datetime.now(UTC).date()
-    for user_id, newsletter in newsletters.items():
-        # Fetch user email from Firestore
-        user_doc = db.collection('users').document(user_id).get()
-        if not user_doc.exists:
-            print(f"User {user_id} not found.")
-            continue
-        user_email = user_doc.to_dict().get('email')
-        if not user_email:
-            print(f"No email for user {user_id}")
-            continue
-        html_content = render_newsletter_html(newsletter)
-        subject = f"Your AI Newsletter for {today}"
-        response = send_newsletter_brevo(user_email, subject, html_content)
-        if response and hasattr(response, 'message_id'):
-            print(f"✅ Newsletter sent to {user_email}")
-            # Mark as delivered in Firestore
-            db.collection('newsletters').document(f"{user_id}_{today}").update({"delivered": True})
+    try:
+        storage.mark_delivered_bulk(user_ids, today.isoformat())
+    except Exception as e:
+        print(f"Failed to mark newsletters delivered for users {', '.join(user_ids)}: {e}")
+
+# Delivered flags are written every this many sends, so a killed run leaves at most this many
+# sent emails unmarked (exceptions flush everything, see create_and_send_newsletters)
+DELIVERY_FLUSH_SIZE = 50
+
+def create_and_send_newsletters(newsletters: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Sends newsletters via Brevo and returns the ids of users they were delivered to."""
+    today = datetime.now(UTC).date()
+    delivered = []
+    unflushed = []
+    users = storage.get_users_bulk(newsletters)  # One bulk lookup for every recipient's email
+    try:
+        for user_id, newsletter in newsletters.items():
+            if user_id not in users:
+                print(f"User {user_id} not found.")
+                continue
+            user_email = users[user_id].get('email')
+            if not user_email:
+                print(f"No email for user {user_id}")
+                continue
+            try:
+                html_content = render_newsletter_html(newsletter)
+                subject = f"Your AI Newsletter for {today}"
+                response = send_newsletter_brevo(user_email, subject, html_content)
+            except Exception as e:
+                # One bad newsletter must not stop the rest of the batch
+                print(f"❌ Failed to send newsletter to {user_email}: {e}")
+                continue
+            if response and hasattr(response, 'message_id'):
+                print(f"✅ Newsletter sent to {user_email}")
+                delivered.append(user_id)
+                unflushed.append(user_id)
+                if len(unflushed) >= DELIVERY_FLUSH_SIZE:
+                    mark_delivered(unflushed)
+                    unflushed.clear()
+            else:
+                print(f"❌ Failed to send newsletter to {user_email}: {response if response else 'No response'}")
+    finally:
+        # Also runs if the loop is interrupted, so emails already sent stay marked.
+        # mark_delivered does not raise, so it cannot hide the original error.
+        if unflushed:
+            mark_delivered(unflushed)
+    return delivered
+
+
+def summarize_topic(topic: str, articles: List[Dict[str, Any]], deduplicator: ArticleDeduplicator,
+                    story_summaries: Dict[int, Dict[str, Any] | None]) -> List[Dict[str, Any]]:
+    """
+    Summarizes the fetched articles for a topic and stores the result.
+    story_summaries caches results by story id, so a story that also appeared in an
+    earlier topic is reused instead of being downloaded and summarized again.
+    """
+    summaries = []
+    budget = DownloadBudget(DOWNLOAD_STAGE_BUDGET)
+    for article_data in articles:
+        story = deduplicator.story_of(article_data)
+        if story is not None and story in story_summaries:
+            summary = story_summaries[story]
         else:
-            print(f"❌ Failed to send newsletter to {user_email}: {response if response else 'No response'}")
+            summary = summarize_article(article_data, topic, budget)
+            if story is not None:
+                story_summaries[story] = summary
+        if summary:
+            summaries.append(summary)
+    store_summaries(topic, summaries)
+    return summaries
+
+
+# --- Event-Driven Orchestrator ---
+def run_event_driven_pipeline(topics: List[str], api_token: str) -> Dict[str, float]:
+    """
+    Sends each user's newsletter as soon as all of their topics are summarized.
+
+    Topics are ordered to minimize mean time-to-inbox, and each topic publishes a
+    completion event that triggers building, storing and sending for every user
+    who was only waiting on it. Returns the per-user time-to-inbox in seconds.
+    """
+    start = time.monotonic()
+
+    print("\n👥 Getting user preferences...")
+    user_preferences = get_user_preferences()
+    if not user_preferences:
+        print("❌ No users with preferences found. Exiting.")
+        return {}
+
+    # Fetching is a cheap API call, so do it up front to estimate each topic's cost.
+    print("\n📰 Fetching articles...")
+    deduplicator = ArticleDeduplicator()
+    topic_articles = {
+        topic: deduplicator.filter(topic, fetch_articles_for_topic(topic, api_token)) for topic in topics
+    }
+    ordered_topics = order_topics_for_delivery(
+        user_preferences, {topic: len(articles) for topic, articles in topic_articles.items()}
+    )
+    print(f"Topic order: {', '.join(ordered_topics)}")
+
+    story_summaries = {}
+    tracker = TopicCompletionTracker(user_preferences, topics)
+    for user_id in tracker.without_topics:
+        print(f"User {user_id} has no known topics, skipping.")
+    ranker = create_article_ranker()
+    already_delivered = get_delivered_users()
+    delivery_times = {}
+
+    def deliver(user_ids: List[str]) -> None:
+        # Every ready user's newsletter is built first, then stored and sent with one bulk call each
+        ranked = ranker.rank({user_id: user_preferences[user_id] for user_id in user_ids}, NEWSLETTER_MAX_ARTICLES)
+        newsletters = {}
+        for user_id in user_ids:
+            newsletter = create_ranked_newsletter(user_id, ranked[user_id])
+            if newsletter['total_articles'] == 0:
+                print(f"No articles for user {user_id}, skipping.")
+                continue
+            if user_id in already_delivered:
+                print(f"Newsletter for user {user_id} was already delivered today, skipping.")
+                continue
+            newsletters[user_id] = newsletter
+        if not newsletters:
+            return
+        store_newsletters(newsletters)
+        for user_id in create_and_send_newsletters(newsletters):
+            delivery_times[user_id] = time.monotonic() - start
+
+    def on_topic_done(topic: str, summaries: List[Dict[str, Any]]) -> None:
+        print(f"\n✅ Topic {topic} done with {len(summaries)} summaries.")
+        # Marked done first, so a failure below cannot leave its users waiting forever
+        ready = tracker.topic_done(topic)
+        try:
+            ranker.add_topic(topic, summaries)
+        except Exception as e:
+            print(f"Failed to rank summaries for {topic}, sending without them: {e}")
+        deliver(ready)
+
+    print("\n📰 Summarizing articles and sending newsletters as topics complete...")
+    run_topic_events(
+        ordered_topics,
+        lambda topic: summarize_topic(topic, topic_articles[topic], deduplicator, story_summaries),
+        on_topic_done
+    )
+
+    report = time_to_inbox_report(delivery_times)
+    print("\n⏱️ Time-to-inbox per user (seconds):")
+    for user_id, seconds in sorted(delivery_times.items(), key=lambda item: item[1]):
+        print(f"  {user_id}: {seconds:.1f}")
+    print(f"  mean={report['mean']:.1f} p50={report['p50']:.1f} p95={report['p95']:.1f} max={report['max']:.1f}")
+    if tracker.pending:
+        print(f"⚠️ {len(tracker.pending)} users never became ready and got no newsletter:")
+        for user_id, waiting in sorted(tracker.pending.items()):
+            print(f"  {user_id}: waiting on {', '.join(sorted(waiting))}")
+    return delivery_times
 
 
 # --- Main Pipeline Orchestrator ---
@@ -436,18 +576,22 @@ def main():
         return
 
     topics = ['general', 'science', 'sports', 'tech', 'entertainment']
+
+    # PIPELINE_MODE=event sends each newsletter as soon as that user's topics are done
+    if os.getenv('PIPELINE_MODE', 'batch') == 'event':
+        delivery_times = run_event_driven_pipeline(topics, api_token)
+        print("\n🎉 AI Pipeline completed successfully!")
+        print(f"📊 Summary: Sent {len(delivery_times)} personalized newsletters as their topics completed.")
+        return
     
     # Step 1 & 2: Fetch and Summarize Articles for each topic
     print("\n📰 Step 1 & 2: Fetching and Summarizing Articles...")
+    deduplicator = ArticleDeduplicator()  # Shared so stories in several topics are summarized once
+    story_summaries = {}
+    ranker = create_article_ranker()
     for topic in topics:
-        articles = fetch_articles_for_topic(topic, api_token)
-        summaries = []
-        if articles:
-            for article_data in articles:
-                summary = summarize_article(article_data, topic)
-                if summary:
-                    summaries.append(summary)
-        store_summaries(topic, summaries)
+        articles = deduplicator.filter(topic, fetch_articles_for_topic(topic, api_token))
+        ranker.add_topic(topic, summarize_topic(topic, articles, deduplicator, story_summaries))
 
     # Step 3: Get user preferences
     print("\n👥 Step 3: Getting user preferences...")
@@ -457,18 +601,23 @@ def main():
         print("❌ No users with preferences found. Exiting.")
         return
     
-    # Step 4: Create personalized newsletters
+    # Step 4: Create personalized newsletters, ranking every user's articles in one batch
     print("\n📧 Step 4: Creating personalized newsletters...")
+    ranked = ranker.rank(user_preferences, NEWSLETTER_MAX_ARTICLES)
+    already_delivered = get_delivered_users()  # A rerun must not overwrite or resend these
     newsletters = {}
-    for user_id, user_topics in user_preferences.items():
-        newsletter = create_personalized_newsletter(user_id, user_topics)
+    for user_id in user_preferences:
+        if user_id in already_delivered:
+            print(f"Newsletter for user {user_id} was already delivered today, skipping.")
+            continue
+        newsletter = create_ranked_newsletter(user_id, ranked[user_id])
         if newsletter['total_articles'] > 0:
             newsletters[user_id] = newsletter
     
-    # Step 5: Store newsletters in Firestore
-    print("\n💾 Step 5: Storing newsletters in Firestore...")
+    # Step 5: Store newsletters
+    print("\n💾 Step 5: Storing newsletters...")
     if newsletters:
-        store_newsletters_in_firestore(newsletters)
+        store_newsletters(newsletters)
     else:
         print("❌ No newsletters were created.")
     
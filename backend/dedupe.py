@@ -0,0 +1,165 @@
+import re
+import hashlib
+import urllib.parse
+from typing import List, Dict, Any, Tuple
+
+# --- Canonical URLs ---
+TRACKING_PARAMS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ocid', 'cmpid', 'smid', 'ref', 'taid', 'guccounter'}
+
+def canonical_url(url: str) -> str:
+    """
+    Normalizes a URL so syndicated or shared copies of the same page compare equal.
+    Lowercases the host and drops the scheme, 'www.' / 'm.' / 'amp.' prefixes, tracking
+    parameters, fragments, AMP suffixes and trailing slashes, and sorts the remaining
+    query parameters. Paths are case-sensitive and kept as they are.
+    Malformed URLs are returned stripped but otherwise unchanged.
+    """
+    try:
+        parts = urllib.parse.urlsplit(url.strip())
+        host = (parts.hostname or '').lower()
+    except ValueError:
+        return url.strip()
+    for prefix in ('www.', 'm.', 'amp.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = (parts.path or '').rstrip('/')
+    path = re.sub(r'/(amp|amp\.html)$', '', path).rstrip('/') or '/'
+    query = [
+        (key, value) for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ]
+    query_str = urllib.parse.urlencode(sorted(query))
+    return f"{host}{path}" + (f"?{query_str}" if query_str else '')
+
+# --- MinHash / LSH ---
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    if len(words) < size:
+        return set(words)
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class MinHashLSH:
+    """
+    Near-duplicate index over short texts (title + description) using MinHash signatures
+    bucketed into LSH bands. Candidates sharing a band are confirmed by estimated Jaccard similarity.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        # Fixed seeds so signatures are stable across runs
+        self.permutations = [
+            (_hash(f"a{i}") % (_MERSENNE_PRIME - 1) + 1, _hash(f"b{i}") % _MERSENNE_PRIME)
+            for i in range(num_perm)
+        ]
+        self.buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(bands)]
+        self.signatures: List[List[int]] = []
+        self.keys: List[Any] = []
+
+    def signature(self, text: str) -> List[int] | None:
+        shingles = _shingles(text)
+        if not shingles:
+            return None
+        hashes = [_hash(s) for s in shingles]
+        return [
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self.permutations
+        ]
+
+    def _band_keys(self, signature: List[int]):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def query(self, signature: List[int]) -> Tuple[Any, float]:
+        """Returns the key of the most similar indexed text and its estimated Jaccard similarity."""
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self.buckets[band].get(key, []))
+        best_key, best = None, 0.0
+        for index in candidates:
+            other = self.signatures[index]
+            similarity = sum(1 for x, y in zip(signature, other) if x == y) / self.num_perm
+            if similarity > best:
+                best_key, best = self.keys[index], similarity
+        return best_key, best
+
+    def insert(self, signature: List[int], key: Any) -> None:
+        index = len(self.signatures)
+        self.signatures.append(signature)
+        self.keys.append(key)
+        for band, key in self._band_keys(signature):
+            self.buckets[band].setdefault(key, []).append(index)
+
+# --- Article Filtering ---
+class ArticleDeduplicator:
+    """
+    Groups news API results into stories before anything is downloaded.
+
+    Copies of a story within one topic are dropped. Copies in other topics are kept,
+    because that topic's readers should still get the story, but they share a story id
+    (see story_of) so the story is only downloaded and summarized once.
+    Keep one instance per run so stories are matched across topics.
+    """
+
+    def __init__(self, threshold: float = 0.5):
+        self.story_by_url: Dict[str, int] = {}
+        self.story_topics: Dict[int, set] = {}
+        self.index = MinHashLSH(threshold=threshold)
+
+    def story_id(self, article: Dict[str, Any]) -> int:
+        """Returns the story an article belongs to, registering a new story if it matches none."""
+        url = article.get('url')
+        key = canonical_url(url) if url else None
+        if key in self.story_by_url:
+            return self.story_by_url[key]
+        text = f"{article.get('title') or ''} {article.get('description') or ''}"
+        signature = self.index.signature(text)
+        story = None
+        if signature is not None:
+            match, similarity = self.index.query(signature)
+            if similarity >= self.index.threshold:
+                story = match
+        if story is None:
+            story = len(self.story_topics)
+            self.story_topics[story] = set()
+            if signature is not None:
+                self.index.insert(signature, story)
+        if key:
+            self.story_by_url[key] = story
+        return story
+
+    def story_of(self, article: Dict[str, Any]) -> int | None:
+        """Returns the story id of an article already passed through filter, or None if it has no URL."""
+        url = article.get('url')
+        return self.story_by_url.get(canonical_url(url)) if url else None
+
+    def filter(self, topic: str, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns one article per story for this topic."""
+        distinct = []
+        seen = set()
+        shared = 0
+        for article in articles:
+            story = self.story_id(article)
+            if story in seen:
+                continue
+            seen.add(story)
+            if self.story_topics[story]:
+                shared += 1
+            self.story_topics[story].add(topic)
+            distinct.append(article)
+        dropped = len(articles) - len(distinct)
+        if dropped:
+            print(f"Dropped {dropped} duplicate articles for {topic} before download.")
+        if shared:
+            print(f"{shared} stories for {topic} also appear in other topics and will be summarized once.")
+        return distinct
@@ -0,0 +1,171 @@
+import time
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List
+
+USER_AGENT = 'Mozilla/5.0 (compatible; VeridianAI newsletter bot)'
+
+class DownloadError(Exception):
+    """Raised when an article could not be downloaded within the policy's limits."""
+
+def fetch_html(url: str, timeout: float) -> str:
+    """Downloads a page and returns its HTML. Non-2XX responses raise."""
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        charset = response.headers.get_content_charset() or 'utf-8'
+        return response.read().decode(charset, errors='replace')
+
+def domain_of(url: str) -> str:
+    return urllib.parse.urlsplit(url).netloc.lower()
+
+class DomainStats:
+    """Failure and latency history for one domain during a run."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.successes = 0
+        self.tripped = False
+
+    def latency_percentile(self, p: float) -> float:
+        values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(p * len(values)))]
+
+class DownloadBudget:
+    """
+    Seconds a stage may spend downloading. Only time spent inside DownloadPolicy.fetch
+    is charged, so parsing and summarizing between downloads do not use it up.
+    """
+
+    def __init__(self, seconds: float):
+        self.remaining = seconds
+        self.lock = threading.Lock()
+
+    def charge(self, seconds: float) -> None:
+        with self.lock:
+            self.remaining -= seconds
+
+class DownloadPolicy:
+    """
+    Bounds how long article downloads can take.
+
+    - Every fetch gets a per-article timeout, further capped by an optional stage DownloadBudget.
+    - Failures and latencies are tracked per domain; a domain that fails
+      `max_consecutive_failures` times in a row is skipped for the rest of the run.
+      Timeouts cut short by the stage budget, or of requests that never left the
+      pool's queue, are not counted as failures.
+    - If a fetch is still running after the domain's usual latency (or `hedge_delay`
+      before enough samples exist), a second identical request is sent and whichever
+      finishes first wins.
+    """
+
+    def __init__(self, article_timeout: float = 10.0, hedge_delay: float = 2.0,
+                 max_consecutive_failures: int = 3, min_latency_samples: int = 5,
+                 fetcher: Callable[[str, float], str] = fetch_html, max_workers: int = 16):
+        self.article_timeout = article_timeout
+        self.hedge_delay = hedge_delay
+        self.max_consecutive_failures = max_consecutive_failures
+        self.min_latency_samples = min_latency_samples
+        self.fetcher = fetcher
+        self.domains: Dict[str, DomainStats] = {}
+        self.lock = threading.Lock()
+        # Abandoned requests keep running in the background until their socket timeout,
+        # so the pool needs headroom beyond the one or two requests we wait on.
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='download')
+
+    def _stats(self, domain: str) -> DomainStats:
+        with self.lock:
+            return self.domains.setdefault(domain, DomainStats())
+
+    def _hedge_after(self, stats: DomainStats) -> float:
+        with self.lock:
+            if len(stats.latencies) >= self.min_latency_samples:
+                return max(0.05, stats.latency_percentile(0.9))
+        return self.hedge_delay
+
+    def _record(self, stats: DomainStats, domain: str, latency: float | None) -> None:
+        with self.lock:
+            if latency is not None:
+                stats.latencies.append(latency)
+                stats.successes += 1
+                stats.consecutive_failures = 0
+                return
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if not stats.tripped and stats.consecutive_failures >= self.max_consecutive_failures:
+                stats.tripped = True
+                print(f"    Circuit breaker tripped for {domain}, skipping it for the rest of the run.")
+
+    def is_open(self, url: str) -> bool:
+        """True if the circuit breaker for this URL's domain has tripped."""
+        stats = self.domains.get(domain_of(url))
+        return bool(stats and stats.tripped)
+
+    def fetch(self, url: str, budget: DownloadBudget | None = None) -> str:
+        """
+        Downloads a URL under the policy, charging the time it takes to `budget`.
+        Raises DownloadError if the domain is tripped, the stage's download budget
+        is spent, or no request succeeds before the timeout.
+        """
+        domain = domain_of(url)
+        stats = self._stats(domain)
+        if stats.tripped:
+            raise DownloadError(f"circuit open for {domain}")
+
+        timeout = self.article_timeout
+        if budget is not None:
+            timeout = min(timeout, budget.remaining)
+        if timeout <= 0:
+            raise DownloadError("download stage budget exceeded")
+
+        start = time.monotonic()
+        try:
+            return self._fetch(url, domain, stats, start, timeout)
+        finally:
+            if budget is not None:
+                budget.charge(time.monotonic() - start)
+
+    def _attempt(self, url: str, timeout: float, started: threading.Event) -> str:
+        started.set()
+        return self.fetcher(url, timeout)
+
+    def _fetch(self, url: str, domain: str, stats: DomainStats, start: float, timeout: float) -> str:
+        give_up_at = start + timeout
+        started = threading.Event()  # Set once a request leaves the pool's queue
+
+        pending = {self.executor.submit(self._attempt, url, timeout, started)}
+        hedge_at = start + self._hedge_after(stats)
+        hedged = False
+        error = None
+        while pending:
+            now = time.monotonic()
+            if now >= give_up_at:
+                break
+            wake_at = give_up_at if hedged else min(hedge_at, give_up_at)
+            done, pending = wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    html = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                for other in pending:
+                    other.cancel()
+                self._record(stats, domain, time.monotonic() - start)
+                return html
+            if not hedged and time.monotonic() >= hedge_at and time.monotonic() < give_up_at:
+                hedged = True
+                pending.add(self.executor.submit(self._attempt, url, give_up_at - time.monotonic(), started))
+
+        for future in pending:
+            future.cancel()
+        # A timeout only counts against the domain if the host had the full article timeout.
+        # Running out of stage budget or waiting behind abandoned requests is not its fault.
+        if error is not None or (started.is_set() and timeout >= self.article_timeout):
+            self._record(stats, domain, None)
+        if error is not None and not pending:
+            raise DownloadError(f"download failed for {url}: {error}")
+        raise DownloadError(f"download timed out after {timeout:.1f}s for {url}")
@@ -2,35 +2,22 @@ import http.client
 import urllib.parse
 import json
 from datetime import datetime, UTC
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
 from dotenv import load_dotenv
+from dedupe import ArticleDeduplicator
+from storage import open_storage
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Firebase
+# Initialize storage (Firestore by default, STORAGE_BACKEND=sqlite for a local file)
 try:
-    # Try to initialize with service account key from environment variable
-    service_account_key = os.getenv('FIREBASE_SERVICE_ACCOUNT_KEY')
-    if service_account_key:
-        import json
-        cred_dict = json.loads(service_account_key)
-        cred = credentials.Certificate(cred_dict)
-        firebase_admin.initialize_app(cred)
-        print("Firebase initialized with environment variable")
-    else:
-        # Fallback to default credentials (for local development)
-        firebase_admin.initialize_app()
-        print("Firebase initialized with default credentials")
+    storage = open_storage()
 except Exception as e:
-    print(f"Firebase initialization failed: {e}")
-    print("Please set FIREBASE_SERVICE_ACCOUNT_KEY in your .env file")
+    print(f"Storage initialization failed: {e}")
+    print("Please set FIREBASE_SERVICE_ACCOUNT_KEY in your .env file, or use STORAGE_BACKEND=sqlite")
     exit(1)
 
-db = firestore.client()
-
 API_TOKEN = os.getenv('THENEWS_API_TOKEN')
 if not API_TOKEN:
     print("THENEWS_API_TOKEN not found in environment variables")
@@ -38,6 +25,8 @@ if not API_TOKEN:
 topics = ['general', 'science', 'sports', 'tech', 'entertainment']  # Add more as needed
 
 today = datetime.now(UTC).date()
+deduplicator = ArticleDeduplicator()  # Drops syndicated copies within a topic
+articles_by_topic = {}
 
 for topic in topics:
     print(f"Fetching news for topic: {topic}")
@@ -61,24 +50,20 @@ for topic in topics:
             article_date = datetime.fromisoformat(published_at.replace("Z", "+00:00")).date()
             if article_date == today:
                 articles_today.append(article)
-        if len(articles_today) == 3:
-            break  # Only keep up to 3 articles
+    articles_today = deduplicator.filter(topic, articles_today)[:3]  # Only keep up to 3 articles
 
-    # Save to Firestore instead of local file
     if articles_today:
-        try:
-            doc_ref = db.collection('raw_articles').document(f"{topic}_{today}")
-            doc_ref.set({
-                'topic': topic,
-                'date': today.isoformat(),
-                'articles': articles_today,
-                'count': len(articles_today),
-                'fetched_at': firestore.SERVER_TIMESTAMP
-            })
-            print(f"Saved {len(articles_today)} articles for {topic} to Firestore")
-        except Exception as e:
-            print(f"Failed to save articles for {topic}: {e}")
+        articles_by_topic[topic] = articles_today
+        print(f"Found {len(articles_today)} articles for {topic}")
     else:
         print(f"No articles found for {topic} today")
 
+# Save every topic to storage in one bulk write instead of a local file
+if articles_by_topic:
+    try:
+        storage.put_raw_articles_bulk(today.isoformat(), articles_by_topic)
+        print(f"Saved articles for {len(articles_by_topic)} topics")
+    except Exception as e:
+        print(f"Failed to save articles: {e}")
+
 print(f"\nNews fetching completed for {len(topics)} topics")
@@ -0,0 +1,127 @@
+import queue
+import threading
+from typing import List, Dict, Any, Callable, Iterable
+
+# --- Topic Ordering ---
+def order_topics_for_delivery(user_preferences: Dict[str, List[str]],
+                              topic_costs: Dict[str, float]) -> List[str]:
+    """
+    Orders topics so that the mean time-to-inbox across users is as small as possible.
+
+    A user's newsletter can only go out once every one of their topics is done, so
+    each step greedily picks the set of remaining topics that completes the most
+    users per unit of estimated work (e.g. number of articles to summarize).
+    Topics nobody subscribes to are processed last.
+    """
+    remaining = [set(t for t in topics if t in topic_costs) for topics in user_preferences.values()]
+    remaining = [topics for topics in remaining if topics]
+    order = []
+    done = set()
+
+    def cost(topic_set):
+        # Every topic costs at least something, otherwise empty topics would tie.
+        return sum(max(topic_costs[t], 1e-6) for t in topic_set)
+
+    while remaining:
+        best_set, best_ratio = None, -1.0
+        for candidate in {frozenset(topics) for topics in remaining}:
+            completed = sum(1 for topics in remaining if topics <= candidate)
+            ratio = completed / cost(candidate)
+            if ratio > best_ratio or (ratio == best_ratio and sorted(candidate) < sorted(best_set)):
+                best_set, best_ratio = candidate, ratio
+
+        # Within the chosen set, cheap and popular topics go first.
+        popularity = {t: sum(1 for topics in remaining if t in topics) for t in best_set}
+        for topic in sorted(best_set, key=lambda t: (topic_costs[t], -popularity[t], t)):
+            order.append(topic)
+            done.add(topic)
+
+        remaining = [topics - done for topics in remaining]
+        remaining = [topics for topics in remaining if topics]
+
+    order.extend(t for t in topic_costs if t not in done)
+    return order
+
+# --- Topic Completion Events ---
+class TopicCompletionTracker:
+    """
+    Tracks which users are waiting on which topics and reports who is ready to receive.
+    Users with none of the known topics are listed in `without_topics` and never become ready.
+    """
+
+    def __init__(self, user_preferences: Dict[str, List[str]], known_topics: Iterable[str]):
+        known = set(known_topics)
+        self.pending: Dict[str, set] = {}
+        self.without_topics: List[str] = []
+        for user_id, topics in user_preferences.items():
+            waiting = set(t for t in topics if t in known)
+            if waiting:
+                self.pending[user_id] = waiting
+            else:
+                self.without_topics.append(user_id)
+
+    def topic_done(self, topic: str) -> List[str]:
+        """Records a completed topic and returns the users whose topics are now all done."""
+        ready = []
+        for user_id, waiting in list(self.pending.items()):
+            waiting.discard(topic)
+            if not waiting:
+                ready.append(user_id)
+                del self.pending[user_id]
+        return ready
+
+_DONE = object()
+
+def run_topic_events(ordered_topics: List[str],
+                     process_topic: Callable[[str], List[Dict[str, Any]]],
+                     on_topic_done: Callable[[str, List[Dict[str, Any]]], None]) -> None:
+    """
+    Processes topics in order on a worker thread and publishes a completion event for each one.
+
+    Events are handled on the calling thread, so building and sending newsletters overlaps
+    with summarization of the next topic instead of waiting for every topic to finish.
+    A failing handler is logged and does not stop later events.
+    """
+    events = queue.Queue()
+
+    def worker():
+        try:
+            for topic in ordered_topics:
+                try:
+                    summaries = process_topic(topic)
+                except Exception as e:
+                    print(f"Failed to process topic {topic}: {e}")
+                    summaries = []
+                events.put((topic, summaries))
+        finally:
+            events.put(_DONE)
+
+    thread = threading.Thread(target=worker, name="topic-worker", daemon=True)
+    thread.start()
+    while True:
+        event = events.get()
+        if event is _DONE:
+            break
+        try:
+            on_topic_done(*event)
+        except Exception as e:
+            print(f"Failed to handle completion of topic {event[0]}: {e}")
+    thread.join()
+
+# --- Time-to-Inbox Report ---
+def time_to_inbox_report(delivery_times: Dict[str, float]) -> Dict[str, float]:
+    """Summarizes per-user time-to-inbox (seconds since the run started)."""
+    if not delivery_times:
+        return {'users': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    values = sorted(delivery_times.values())
+
+    def percentile(p):
+        return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+    return {
+        'users': len(values),
+        'mean': sum(values) / len(values),
+        'p50': percentile(0.5),
+        'p95': percentile(0.95),
+        'max': values[-1],
+    }
@@ -0,0 +1,145 @@
+import numpy as np
+from typing import List, Dict, Any, Callable, Tuple
+
+RankedArticles = List[Tuple[str, Dict[str, Any]]]
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+class ArticleRanker:
+    """
+    Ranks the day's articles for every user at once.
+
+    Article embeddings are kept as one (articles x dim) matrix. Each user's interest
+    vector is built from their topic vectors, optionally blended with the mean
+    embedding of articles they clicked. All users in a chunk are scored against all
+    articles with one batched product, followed by a top-k selection restricted to
+    the user's topics. A summary shared by several topics (same URL) is one article
+    that belongs to all of them, so nobody receives it twice.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], click_weight: float = 0.5):
+        self.encode = encode
+        self.click_weight = click_weight
+        self.articles: List[Dict[str, Any]] = []
+        self.article_ids: Dict[str, int] = {}
+        self.article_topics: List[List[int]] = []
+        self.topics: List[str] = []
+        self.topic_ids: Dict[str, int] = {}
+        self.topic_vectors = np.zeros((0, 0), dtype=np.float32)
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+
+    def add_topic(self, topic: str, summaries: List[Dict[str, Any]]) -> None:
+        """Embeds a topic's summaries and appends them to the article matrix."""
+        if topic not in self.topic_ids:
+            vector = _normalize(np.asarray(self.encode([f"{topic} news"]), dtype=np.float32))
+            self.topic_ids[topic] = len(self.topics)
+            self.topics.append(topic)
+            self.topic_vectors = vector if not self.topic_vectors.size else np.vstack([self.topic_vectors, vector])
+        topic_id = self.topic_ids[topic]
+        new = []
+        for summary in summaries:
+            index = self.article_ids.get(summary.get('url'))
+            if index is None:
+                new.append(summary)
+            elif topic_id not in self.article_topics[index]:
+                self.article_topics[index].append(topic_id)
+        if not new:
+            return
+        texts = [f"{s.get('header', '')}. {s.get('summary', '')}" for s in new]
+        vectors = _normalize(np.asarray(self.encode(texts), dtype=np.float32))
+        self.embeddings = vectors if not self.embeddings.size else np.vstack([self.embeddings, vectors])
+        for summary in new:
+            if summary.get('url'):
+                self.article_ids[summary['url']] = len(self.articles)
+            self.articles.append(summary)
+            self.article_topics.append([topic_id])
+
+    def _membership(self, user_topics: List[List[str]]) -> np.ndarray:
+        membership = np.zeros((len(user_topics), len(self.topics)), dtype=np.float32)
+        for row, topics in enumerate(user_topics):
+            for topic in topics:
+                column = self.topic_ids.get(topic)
+                if column is not None:
+                    membership[row, column] = 1.0
+        return membership
+
+    def score(self, membership: np.ndarray, clicks: np.ndarray | None = None) -> np.ndarray:
+        """
+        Cosine scores of every user's interest vector against every article.
+
+        The topic part of the interest vector is membership @ topic_vectors, so its scores
+        are computed as membership @ (topic_vectors @ embeddings.T) and normalized by the
+        vector's length, without materializing a (users x dim) matrix. Rows of `clicks`
+        that are non-zero are blended in with `click_weight`.
+        """
+        topic_scores = self.topic_vectors @ self.embeddings.T
+        gram = self.topic_vectors @ self.topic_vectors.T
+        lengths = np.sqrt(np.maximum(np.einsum('ij,jk,ik->i', membership, gram, membership), 1e-12))
+        scores = (membership @ topic_scores) / lengths[:, None]
+        if clicks is not None:
+            rows = np.flatnonzero(np.abs(clicks).sum(axis=1))
+            if rows.size:
+                click_scores = _normalize(clicks[rows]) @ self.embeddings.T
+                scores[rows] = (1 - self.click_weight) * scores[rows] + self.click_weight * click_scores
+        return scores
+
+    def rank(self, user_preferences: Dict[str, List[str]], top_k: int | None = None,
+             click_vectors: Dict[str, np.ndarray] | None = None,
+             chunk_size: int = 16384) -> Dict[str, RankedArticles]:
+        """
+        Returns up to top_k (topic, summary) pairs per user, best first, drawn only from
+        the user's selected topics. A shared article is listed under the first of its
+        topics (in the order they were added) that the user selected. click_vectors maps
+        user ids to the mean embedding of articles they clicked.
+        """
+        user_ids = list(user_preferences)
+        n_articles = len(self.articles)
+        if not n_articles or not user_ids:
+            return {user_id: [] for user_id in user_ids}
+        k = n_articles if not top_k else min(top_k, n_articles)
+
+        # Users share membership rows by topic selection, so only distinct selections are built.
+        groups: Dict[Tuple[str, ...], int] = {}
+        user_groups = np.fromiter(
+            (groups.setdefault(tuple(user_preferences[user_id]), len(groups)) for user_id in user_ids),
+            dtype=np.int64, count=len(user_ids)
+        )
+        group_membership = self._membership([list(key) for key in groups])
+        # (articles x topics) membership, and every (topic, summary) pair the result can contain
+        article_membership = np.zeros((n_articles, len(self.topics)), dtype=np.float32)
+        pairs = np.empty((len(self.topics), n_articles), dtype=object)
+        for index, (summary, topic_ids) in enumerate(zip(self.articles, self.article_topics)):
+            article_membership[index, topic_ids] = 1.0
+            for topic_id in topic_ids:
+                pairs[topic_id, index] = (self.topics[topic_id], summary)
+
+        ranked = {}
+        for begin in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[begin:begin + chunk_size]
+            membership = group_membership[user_groups[begin:begin + chunk_size]]
+            clicks = None
+            if click_vectors:
+                clicks = np.zeros((len(chunk), self.embeddings.shape[1]), dtype=np.float32)
+                for row, user_id in enumerate(chunk):
+                    if user_id in click_vectors:
+                        clicks[row] = click_vectors[user_id]
+
+            scores = self.score(membership, clicks)
+            scores[(membership @ article_membership.T) == 0] = -np.inf
+
+            if k < n_articles:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(n_articles), (len(chunk), n_articles))
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            # Articles outside the user's topics sort last, so the valid ones form a prefix.
+            counts = np.isfinite(np.take_along_axis(top_scores, order, axis=1)).sum(axis=1).tolist()
+            # First topic of each picked article that the user selected
+            shown_topic = np.argmax(membership[:, None, :] * article_membership[top], axis=2)
+            for user_id, row, count in zip(chunk, pairs[shown_topic, top].tolist(), counts):
+                ranked[user_id] = row if count == k else row[:count]
+        return ranked
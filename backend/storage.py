@@ -0,0 +1,357 @@
+import os
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, UTC
+from typing import List, Dict, Any, Iterable
+
+# --- Storage Interface ---
+class Storage(ABC):
+    """
+    Persistence for raw articles, summaries, users, newsletters and delivery status.
+
+    Documents are keyed by (topic, date) or (user_id, date), with dates as ISO strings.
+    Bulk methods take or return dicts so backends can batch round trips.
+    """
+
+    @abstractmethod
+    def put_raw_articles_bulk(self, date: str, articles_by_topic: Dict[str, List[Dict[str, Any]]]) -> None:
+        ...
+
+    @abstractmethod
+    def get_raw_articles_bulk(self, topics: Iterable[str], date: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Returns raw articles for the topics that have any stored on that date."""
+
+    @abstractmethod
+    def put_summaries_bulk(self, date: str, summaries_by_topic: Dict[str, List[Dict[str, Any]]]) -> None:
+        ...
+
+    @abstractmethod
+    def get_summaries_bulk(self, topics: Iterable[str], date: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Returns summaries for the topics that have any stored on that date."""
+
+    @abstractmethod
+    def put_users(self, users: Dict[str, Dict[str, Any]]) -> None:
+        ...
+
+    @abstractmethod
+    def get_users(self) -> Dict[str, Dict[str, Any]]:
+        """Returns every user document keyed by user id."""
+
+    @abstractmethod
+    def get_users_bulk(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Returns the user documents that exist among user_ids."""
+
+    @abstractmethod
+    def put_newsletters_bulk(self, date: str, newsletters: Dict[str, Dict[str, Any]]) -> None:
+        """Stores newsletters keyed by user id, marked as not yet delivered."""
+
+    @abstractmethod
+    def get_newsletters_bulk(self, user_ids: Iterable[str], date: str) -> Dict[str, Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def mark_delivered_bulk(self, user_ids: Iterable[str], date: str) -> None:
+        """Flags newsletters as delivered. Users without a stored newsletter are skipped, not an error."""
+
+    @abstractmethod
+    def get_delivery_status(self, date: str) -> Dict[str, bool]:
+        """Returns whether each newsletter stored for that date was delivered, keyed by user id."""
+
+    # Single-document conveniences on top of the bulk methods
+    def put_raw_articles(self, topic: str, date: str, articles: List[Dict[str, Any]]) -> None:
+        self.put_raw_articles_bulk(date, {topic: articles})
+
+    def get_raw_articles(self, topic: str, date: str) -> List[Dict[str, Any]] | None:
+        """Returns the stored articles, or None if nothing was stored for that topic and date."""
+        return self.get_raw_articles_bulk([topic], date).get(topic)
+
+    def put_summaries(self, topic: str, date: str, summaries: List[Dict[str, Any]]) -> None:
+        self.put_summaries_bulk(date, {topic: summaries})
+
+    def get_summaries(self, topic: str, date: str) -> List[Dict[str, Any]] | None:
+        return self.get_summaries_bulk([topic], date).get(topic)
+
+    def put_newsletter(self, user_id: str, date: str, newsletter: Dict[str, Any]) -> None:
+        self.put_newsletters_bulk(date, {user_id: newsletter})
+
+# --- Firestore Backend ---
+def init_firestore():
+    """Initializes the Firebase app from FIREBASE_SERVICE_ACCOUNT_KEY or default credentials and returns a client."""
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    if not firebase_admin._apps:
+        service_account_key = os.getenv('FIREBASE_SERVICE_ACCOUNT_KEY')
+        if service_account_key:
+            cred_dict = json.loads(service_account_key)
+            cred = credentials.Certificate(cred_dict)
+            firebase_admin.initialize_app(cred)
+            print("Firebase initialized with environment variable")
+        else:
+            firebase_admin.initialize_app()
+            print("Firebase initialized with default credentials")
+    return firestore.client()
+
+class FirestoreStorage(Storage):
+    """Stores documents in the Firestore collections the frontend and pipeline already use."""
+
+    BATCH_LIMIT = 500  # Firestore's maximum writes per batch
+
+    def __init__(self, db=None):
+        from firebase_admin import firestore
+        self.db = db or init_firestore()
+        self.server_timestamp = firestore.SERVER_TIMESTAMP
+
+    def _write_all(self, writes: List[tuple]) -> None:
+        """Commits (doc_ref, data, merge) writes in batches."""
+        for begin in range(0, len(writes), self.BATCH_LIMIT):
+            batch = self.db.batch()
+            for doc_ref, data, merge in writes[begin:begin + self.BATCH_LIMIT]:
+                batch.set(doc_ref, data, merge=merge)
+            batch.commit()
+
+    def _update_all(self, updates: List[tuple]) -> None:
+        """Commits (doc_ref, data) updates in batches. Fails rather than creating missing documents."""
+        for begin in range(0, len(updates), self.BATCH_LIMIT):
+            batch = self.db.batch()
+            for doc_ref, data in updates[begin:begin + self.BATCH_LIMIT]:
+                batch.update(doc_ref, data)
+            batch.commit()
+
+    def _get_all(self, collection: str, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        refs = [self.db.collection(collection).document(doc_id) for doc_id in doc_ids]
+        if not refs:
+            return {}
+        return {doc.id: doc.to_dict() for doc in self.db.get_all(refs) if doc.exists}
+
+    def put_raw_articles_bulk(self, date, articles_by_topic):
+        self._write_all([
+            (self.db.collection('raw_articles').document(f"{topic}_{date}"), {
+                'topic': topic,
+                'date': date,
+                'articles': articles,
+                'count': len(articles),
+                'fetched_at': self.server_timestamp
+            }, False)
+            for topic, articles in articles_by_topic.items()
+        ])
+
+    def get_raw_articles_bulk(self, topics, date):
+        docs = self._get_all('raw_articles', [f"{topic}_{date}" for topic in topics])
+        return {data.get('topic'): data.get('articles', []) for data in docs.values()}
+
+    def put_summaries_bulk(self, date, summaries_by_topic):
+        self._write_all([
+            (self.db.collection('summaries').document(f"{topic}_{date}"), {
+                'topic': topic,
+                'date': date,
+                'summaries': summaries,
+                'count': len(summaries),
+                'created_at': self.server_timestamp
+            }, False)
+            for topic, summaries in summaries_by_topic.items()
+        ])
+
+    def get_summaries_bulk(self, topics, date):
+        docs = self._get_all('summaries', [f"{topic}_{date}" for topic in topics])
+        return {data.get('topic'): data.get('summaries', []) for data in docs.values()}
+
+    def put_users(self, users):
+        self._write_all([
+            (self.db.collection('users').document(user_id), data, True) for user_id, data in users.items()
+        ])
+
+    def get_users(self):
+        return {user.id: user.to_dict() for user in self.db.collection('users').stream()}
+
+    def get_users_bulk(self, user_ids):
+        return self._get_all('users', list(user_ids))
+
+    def put_newsletters_bulk(self, date, newsletters):
+        self._write_all([
+            (self.db.collection('newsletters').document(f"{user_id}_{date}"), {
+                'user_id': user_id,
+                'date': date,
+                'content': newsletter,
+                'created_at': self.server_timestamp,
+                'delivered': False
+            }, False)
+            for user_id, newsletter in newsletters.items()
+        ])
+
+    def get_newsletters_bulk(self, user_ids, date):
+        docs = self._get_all('newsletters', [f"{user_id}_{date}" for user_id in user_ids])
+        return {data['user_id']: data.get('content', {}) for data in docs.values()}
+
+    def mark_delivered_bulk(self, user_ids, date):
+        from google.api_core.exceptions import NotFound
+        refs = {user_id: self.db.collection('newsletters').document(f"{user_id}_{date}") for user_id in user_ids}
+        user_ids = list(refs)
+        for begin in range(0, len(user_ids), self.BATCH_LIMIT):
+            chunk = user_ids[begin:begin + self.BATCH_LIMIT]
+            try:
+                self._update_all([(refs[user_id], {'delivered': True}) for user_id in chunk])
+            except NotFound:
+                # One missing newsletter fails the whole batch, so flag the rest one at a time
+                missing = []
+                for user_id in chunk:
+                    try:
+                        refs[user_id].update({'delivered': True})
+                    except NotFound:
+                        missing.append(user_id)
+                print(f"No stored newsletter to mark delivered for users: {', '.join(missing)}")
+
+    def get_delivery_status(self, date):
+        docs = self.db.collection('newsletters').where('date', '==', date).stream()
+        return {doc.get('user_id'): bool(doc.get('delivered')) for doc in docs}
+
+# --- SQLite Backend ---
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw_articles (
+    topic TEXT NOT NULL,
+    date TEXT NOT NULL,
+    articles TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    fetched_at TEXT NOT NULL,
+    PRIMARY KEY (topic, date)
+);
+CREATE INDEX IF NOT EXISTS raw_articles_date ON raw_articles (date);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    topic TEXT NOT NULL,
+    date TEXT NOT NULL,
+    summaries TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (topic, date)
+);
+CREATE INDEX IF NOT EXISTS summaries_date ON summaries (date);
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS newsletters (
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    delivered INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, date)
+);
+CREATE INDEX IF NOT EXISTS newsletters_date_delivered ON newsletters (date, delivered);
+"""
+
+class SQLiteStorage(Storage):
+    """
+    Local storage in a single SQLite file (WAL mode) for offline runs, replays of past
+    days and load tests. Documents are stored as JSON, keyed and indexed by date, topic and user.
+    """
+
+    def __init__(self, path: str = 'veridian.db'):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()  # The pipeline writes from a worker thread and the main thread
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SQLITE_SCHEMA)
+            self.connection.commit()
+
+    def _write(self, sql: str, rows: List[tuple]) -> None:
+        with self.lock, self.connection:
+            self.connection.executemany(sql, rows)
+
+    def _read(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def _read_in(self, sql: str, keys: List[str], params: tuple = ()) -> List[tuple]:
+        """Runs a query with an `IN ({})` placeholder, chunked under SQLite's variable limit."""
+        rows = []
+        for begin in range(0, len(keys), 500):
+            chunk = keys[begin:begin + 500]
+            rows.extend(self._read(sql.format(','.join('?' * len(chunk))), tuple(chunk) + params))
+        return rows
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(UTC).isoformat()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    def put_raw_articles_bulk(self, date, articles_by_topic):
+        now = self._now()
+        self._write(
+            "INSERT OR REPLACE INTO raw_articles (topic, date, articles, count, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            [(topic, date, json.dumps(articles), len(articles), now)
+             for topic, articles in articles_by_topic.items()]
+        )
+
+    def get_raw_articles_bulk(self, topics, date):
+        rows = self._read_in("SELECT topic, articles FROM raw_articles WHERE topic IN ({}) AND date = ?",
+                             list(topics), (date,))
+        return {topic: json.loads(articles) for topic, articles in rows}
+
+    def put_summaries_bulk(self, date, summaries_by_topic):
+        now = self._now()
+        self._write(
+            "INSERT OR REPLACE INTO summaries (topic, date, summaries, count, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(topic, date, json.dumps(summaries), len(summaries), now)
+             for topic, summaries in summaries_by_topic.items()]
+        )
+
+    def get_summaries_bulk(self, topics, date):
+        rows = self._read_in("SELECT topic, summaries FROM summaries WHERE topic IN ({}) AND date = ?",
+                             list(topics), (date,))
+        return {topic: json.loads(summaries) for topic, summaries in rows}
+
+    def put_users(self, users):
+        existing = self.get_users_bulk(users)
+        self._write(
+            "INSERT OR REPLACE INTO users (user_id, data) VALUES (?, ?)",
+            [(user_id, json.dumps({**existing.get(user_id, {}), **data})) for user_id, data in users.items()]
+        )
+
+    def get_users(self):
+        return {user_id: json.loads(data) for user_id, data in self._read("SELECT user_id, data FROM users")}
+
+    def get_users_bulk(self, user_ids):
+        rows = self._read_in("SELECT user_id, data FROM users WHERE user_id IN ({})", list(user_ids))
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    def put_newsletters_bulk(self, date, newsletters):
+        now = self._now()
+        self._write(
+            "INSERT OR REPLACE INTO newsletters (user_id, date, content, created_at, delivered) VALUES (?, ?, ?, ?, 0)",
+            [(user_id, date, json.dumps(newsletter), now) for user_id, newsletter in newsletters.items()]
+        )
+
+    def get_newsletters_bulk(self, user_ids, date):
+        rows = self._read_in("SELECT user_id, content FROM newsletters WHERE user_id IN ({}) AND date = ?",
+                             list(user_ids), (date,))
+        return {user_id: json.loads(content) for user_id, content in rows}
+
+    def mark_delivered_bulk(self, user_ids, date):
+        self._write("UPDATE newsletters SET delivered = 1 WHERE user_id = ? AND date = ?",
+                    [(user_id, date) for user_id in user_ids])
+
+    def get_delivery_status(self, date):
+        rows = self._read("SELECT user_id, delivered FROM newsletters WHERE date = ?", (date,))
+        return {user_id: bool(delivered) for user_id, delivered in rows}
+
+# --- Backend Selection ---
+def open_storage() -> Storage:
+    """Opens the backend named by STORAGE_BACKEND ('firestore' by default, or 'sqlite' at SQLITE_PATH)."""
+    backend = os.getenv('STORAGE_BACKEND', 'firestore').lower()
+    if backend == 'sqlite':
+        path = os.getenv('SQLITE_PATH', 'veridian.db')
+        print(f"Using local SQLite storage at {path}")
+        return SQLiteStorage(path)
+    if backend == 'firestore':
+        return FirestoreStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
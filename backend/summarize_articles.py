@@ -3,66 +3,60 @@ import os
 from datetime import datetime, UTC
 from newspaper import Article
 from transformers import pipeline
-import firebase_admin
-from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
+from download_policy import DownloadPolicy, DownloadBudget
+from dedupe import ArticleDeduplicator
+from storage import open_storage
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Firebase
+# Initialize storage (Firestore by default, STORAGE_BACKEND=sqlite for a local file)
 try:
-    # Try to initialize with service account key from environment variable
-    service_account_key = os.getenv('FIREBASE_SERVICE_ACCOUNT_KEY')
-    if service_account_key:
-        import json
-        cred_dict = json.loads(service_account_key)
-        cred = credentials.Certificate(cred_dict)
-        firebase_admin.initialize_app(cred)
-        print("Firebase initialized with environment variable")
-    else:
-        # Fallback to default credentials (for local development)
-        firebase_admin.initialize_app()
-        print("Firebase initialized with default credentials")
+    storage = open_storage()
 except Exception as e:
-    print(f"Firebase initialization failed: {e}")
-    print("Please set FIREBASE_SERVICE_ACCOUNT_KEY in your .env file")
+    print(f"Storage initialization failed: {e}")
+    print("Please set FIREBASE_SERVICE_ACCOUNT_KEY in your .env file, or use STORAGE_BACKEND=sqlite")
     exit(1)
 
-db = firestore.client()
-
 # Set up summarizer
 print("Loading BART summarization model...")
 summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
 print("Summarization model loaded")
 
+# Bound download time per article and per topic, skip domains that keep failing
+download_policy = DownloadPolicy(article_timeout=float(os.getenv('ARTICLE_DOWNLOAD_TIMEOUT', '10')))
+download_stage_budget = float(os.getenv('DOWNLOAD_STAGE_BUDGET', '60'))
+
 topics = ['general', 'science', 'sports', 'tech', 'entertainment']
 today = datetime.now(UTC).date()
 
+# Stories shared by several topics are summarized once and reused (None if that failed)
+deduplicator = ArticleDeduplicator()
+story_summaries = {}
+
+# Get every topic's articles from storage in one bulk read
+try:
+    articles_by_topic = storage.get_raw_articles_bulk(topics, today.isoformat())
+except Exception as e:
+    print(f"Failed to get articles: {e}")
+    exit(1)
+
 for topic in topics:
     print(f"\nProcessing summaries for topic: {topic}")
     
-    try:
-        # Get articles from Firestore
-        doc_ref = db.collection('raw_articles').document(f"{topic}_{today}")
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            print(f"No articles found for {topic} today")
-            continue
-            
-        data = doc.to_dict()
-        articles = data.get('articles', [])
-        
-        if not articles:
-            print(f"No articles in document for {topic}")
-            continue
-            
-    except Exception as e:
-        print(f"Failed to get articles for {topic}: {e}")
+    articles = articles_by_topic.get(topic)
+    if articles is None:
+        print(f"No articles found for {topic} today")
         continue
 
+    if not articles:
+        print(f"No articles in document for {topic}")
+        continue
+
+    articles = deduplicator.filter(topic, articles)
     summaries = []
+    budget = DownloadBudget(download_stage_budget)  # Only download time counts, not summarization
     for i, article in enumerate(articles):
         url = article.get("url")
         if not url:
@@ -70,10 +64,19 @@ for topic in topics:
 
         print(f"  Processing article {i+1}/{len(articles)}: {url[:50]}...")
 
+        story = deduplicator.story_of(article)
+        if story in story_summaries:
+            if story_summaries[story]:
+                summaries.append(story_summaries[story])
+                print(f"    Reused summary from another topic")
+            continue
+        story_summaries[story] = None
+
         # Scrape the article text
         try:
+            html = download_policy.fetch(url, budget)
             news_article = Article(url)
-            news_article.download()
+            news_article.download(input_html=html)
             news_article.parse()
             text = news_article.text
         except Exception as e:
@@ -94,27 +97,21 @@ for topic in topics:
         # Use the title as the catchy header
         header = article.get("title", "No Title")
 
-        summaries.append({
+        story_summaries[story] = {
             "header": header,
             "summary": summary,
             "url": url,
             "original_article": article  # Keep reference to original
-        })
+        }
+        summaries.append(story_summaries[story])
         
         print(f"    Summarized successfully")
 
-    # Save summaries to Firestore
+    # Save summaries to storage
     if summaries:
         try:
-            doc_ref = db.collection('summaries').document(f"{topic}_{today}")
-            doc_ref.set({
-                'topic': topic,
-                'date': today.isoformat(),
-                'summaries': summaries,
-                'count': len(summaries),
-                'created_at': firestore.SERVER_TIMESTAMP
-            })
-            print(f"Saved {len(summaries)} summaries for {topic} to Firestore")
+            storage.put_summaries(topic, today.isoformat(), summaries)
+            print(f"Saved {len(summaries)} summaries for {topic}")
         except Exception as e:
             print(f"Failed to save summaries for {topic}: {e}")
     else:
@@ -0,0 +1,41 @@
+from dedupe import canonical_url, ArticleDeduplicator
+
+def test_duplicate_filtering_before_download():
+    """Test that syndicated copies are dropped within a topic and shared across topics"""
+    print("🧪 Testing pre-download duplicate filtering...")
+
+    assert canonical_url("https://www.Example.com/news/story/amp/?utm_source=x&b=2&a=1#top") == \
+        "example.com/news/story?a=1&b=2"
+    assert canonical_url("https://Example.com/News/Story") == "example.com/News/Story"  # Paths keep their case
+    assert canonical_url(" http://[abc/x ") == "http://[abc/x"  # Malformed URLs fall back to the raw URL
+
+    wire_title = "Fed raises interest rates by a quarter point amid inflation fears"
+    wire_description = "The Federal Reserve raised its benchmark rate on Wednesday, citing persistent inflation."
+    general = [
+        {'url': 'https://apnews.com/article/fed-rates', 'title': wire_title, 'description': wire_description},
+        {'url': 'https://www.apnews.com/article/fed-rates/?utm_source=twitter', 'title': 'Fed', 'description': ''},
+        {'url': 'https://localpaper.com/wire/fed', 'title': wire_title,
+         'description': wire_description + " Officials said more hikes are possible."},
+        {'url': 'https://espn.com/nba/recap', 'title': 'Lakers beat Celtics in overtime thriller',
+         'description': 'LeBron James scored 40 points as Los Angeles rallied late.'},
+    ]
+    sports = [general[3], {'url': 'https://espn.com/nfl/recap', 'title': 'Chiefs edge Bills on late field goal',
+                           'description': 'Kansas City kicked a 45-yarder as time expired.'}]
+
+    deduplicator = ArticleDeduplicator()
+    assert [a['url'] for a in deduplicator.filter('general', general)] == [general[0]['url'], general[3]['url']]
+    # The Lakers recap stays in sports, as the same story as in general
+    assert [a['url'] for a in deduplicator.filter('sports', sports)] == [sports[0]['url'], sports[1]['url']]
+    assert deduplicator.story_of(sports[0]) == deduplicator.story_of(general[3])
+    assert deduplicator.story_of(general[2]) == deduplicator.story_of(general[0])
+    assert deduplicator.story_of(sports[1]) != deduplicator.story_of(general[3])
+
+    # A malformed URL from the news API does not abort filtering
+    malformed = {'url': 'http://[abc/x', 'title': 'Mars rover finds signs of ancient lake', 'description': ''}
+    assert deduplicator.filter('science', [malformed, dict(malformed)]) == [malformed]
+    assert deduplicator.story_of(malformed) is not None
+    print("✅ Each story is downloaded once and kept in every topic it appeared in")
+    return True
+
+if __name__ == "__main__":
+    test_duplicate_filtering_before_download()
@@ -0,0 +1,135 @@
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from download_policy import DownloadPolicy, DownloadBudget, DownloadError
+
+PAGE = b"<html><body><p>Article body</p></body></html>"
+
+class SimulatedHostHandler(BaseHTTPRequestHandler):
+    """/ok answers at once, /slow hangs, /fail returns 500, /slow-once hangs only on the first request"""
+    first_request_seen = set()
+
+    def do_GET(self):
+        if self.path.startswith('/slow-once'):
+            if self.path not in self.first_request_seen:
+                self.first_request_seen.add(self.path)
+                time.sleep(3)
+        elif self.path.startswith('/slow'):
+            time.sleep(3)
+        elif self.path.startswith('/fail'):
+            self.send_response(500)
+            self.end_headers()
+            return
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.end_headers()
+            self.wfile.write(PAGE)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+def start_host():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SimulatedHostHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def timed_fetch(policy, url, budget=None):
+    start = time.monotonic()
+    try:
+        policy.fetch(url, budget)
+        ok = True
+    except DownloadError:
+        ok = False
+    return ok, time.monotonic() - start
+
+def test_download_policy_bounds_tail_latency():
+    """Test timeouts, stage budgets, circuit breakers and hedging against slow and failing local hosts"""
+    print("🧪 Testing download policy against simulated hosts...")
+    healthy, healthy_url = start_host()
+    failing, failing_url = start_host()
+    slow, slow_url = start_host()
+    article_timeout = 0.5
+    policy = DownloadPolicy(article_timeout=article_timeout, hedge_delay=0.2, max_consecutive_failures=3)
+    try:
+        # Hedging: the first request hangs, the hedged one answers
+        ok, elapsed = timed_fetch(policy, f"{healthy_url}/slow-once/1")
+        assert ok and elapsed < article_timeout, elapsed
+
+        # Circuit breaker: after three failures the domain is skipped without a request
+        for i in range(3):
+            ok, _ = timed_fetch(policy, f"{failing_url}/fail/{i}")
+            assert not ok
+        assert policy.is_open(f"{failing_url}/ok")
+        ok, elapsed = timed_fetch(policy, f"{failing_url}/ok")
+        assert not ok and elapsed < 0.05, elapsed
+
+        # Timeouts: a hanging host costs at most the article timeout, then trips too
+        stage_budget = 3.0
+        stage_start = time.monotonic()
+        budget = DownloadBudget(stage_budget)
+        times = []
+        for i in range(40):
+            url = f"{slow_url}/slow/{i}" if i % 4 == 0 else f"{healthy_url}/ok/{i}"
+            times.append(timed_fetch(policy, url, budget)[1])
+        stage_time = time.monotonic() - stage_start
+        assert policy.is_open(f"{slow_url}/ok")
+
+        times.sort()
+        p99 = times[int(0.99 * (len(times) - 1))]
+        assert p99 <= article_timeout + 0.2, p99
+        assert stage_time <= stage_budget + 0.2, stage_time
+
+        # Stage budget: once it is spent nothing else is attempted
+        ok, elapsed = timed_fetch(policy, f"{healthy_url}/ok/late", DownloadBudget(0))
+        assert not ok and elapsed < 0.05
+
+        # A nearly spent stage budget cuts fetches short without tripping a healthy host
+        for i in range(4):
+            ok, _ = timed_fetch(policy, f"{healthy_url}/slow/budget/{i}", DownloadBudget(0.1))
+            assert not ok
+        assert not policy.is_open(f"{healthy_url}/ok")
+
+        # Neither do requests that time out while queued behind a busy pool
+        release = threading.Event()
+
+        def blocking_fetcher(url, timeout):
+            if '/block' in url:
+                release.wait(3)
+            return PAGE.decode()
+
+        queued = DownloadPolicy(article_timeout=0.2, hedge_delay=10, max_consecutive_failures=1,
+                                fetcher=blocking_fetcher, max_workers=1)
+        try:
+            assert not timed_fetch(queued, "http://busy.example/block")[0]
+            assert queued.is_open("http://busy.example/")  # It started and used its full timeout
+            assert not timed_fetch(queued, "http://starved.example/ok")[0]
+            assert not queued.is_open("http://starved.example/")
+        finally:
+            release.set()
+            queued.executor.shutdown(wait=True)
+
+        # Summarizing between downloads is not charged: every article still downloads
+        # even though the stage takes far longer than its download budget
+        download_budget = 0.5
+        budget = DownloadBudget(download_budget)
+        summarize_start = time.monotonic()
+        for i in range(5):
+            ok, _ = timed_fetch(policy, f"{healthy_url}/ok/summarized/{i}", budget)
+            assert ok, i
+            time.sleep(0.2)  # Simulated BART summarization
+        assert time.monotonic() - summarize_start > 2 * download_budget
+        assert budget.remaining > 0
+
+        print(f"✅ p99 fetch time {p99:.2f}s, stage time {stage_time:.2f}s")
+        return True
+    finally:
+        for server in (healthy, failing, slow):
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    test_download_policy_bounds_tail_latency()
@@ -0,0 +1,37 @@
+from orchestration import order_topics_for_delivery, TopicCompletionTracker, run_topic_events
+
+def test_event_driven_delivery_order():
+    """Test that cheap single-topic subscribers are served before the expensive topics finish"""
+    print("🧪 Testing event-driven topic ordering...")
+
+    user_preferences = {
+        'sports_fan': ['sports'],
+        'techie': ['tech', 'sports'],
+        'reader': ['general', 'science', 'tech'],
+        'cook': ['cooking'],
+    }
+    topic_costs = {'general': 5, 'science': 5, 'sports': 2, 'tech': 3, 'entertainment': 4}
+
+    order = order_topics_for_delivery(user_preferences, topic_costs)
+    assert order[0] == 'sports', order
+    assert order[-1] == 'entertainment', order  # nobody subscribes to it
+    assert sorted(order) == sorted(topic_costs)
+
+    tracker = TopicCompletionTracker(user_preferences, topic_costs)
+    assert tracker.without_topics == ['cook']
+    ready, handled = [], []
+
+    def on_topic_done(topic, summaries):
+        handled.append(topic)
+        if topic == 'science':
+            raise RuntimeError("simulated send failure")  # Must not stop later events
+        ready.extend(tracker.topic_done(topic))
+
+    run_topic_events(order, lambda topic: [{'header': topic}], on_topic_done)
+    assert handled == order, handled
+    assert ready == ['sports_fan', 'techie'], ready
+    print("✅ Users received newsletters in order:", ready)
+    return True
+
+if __name__ == "__main__":
+    test_event_driven_delivery_order()
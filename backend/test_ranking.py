@@ -0,0 +1,53 @@
+import os
+import time
+import random
+import numpy as np
+from ranking import ArticleRanker
+
+def test_batched_ranking():
+    """
+    Test that ranking all users at once matches per-user scoring.
+    Set RANKING_BENCHMARK=1 to rank 100k users and check it takes under a second.
+    """
+    print("🧪 Testing batched article ranking...")
+
+    rng = np.random.default_rng(0)
+    ranker = ArticleRanker(lambda texts: rng.standard_normal((len(texts), 384)).astype(np.float32))
+    topics = ['general', 'science', 'sports', 'tech', 'entertainment']
+    for topic in topics:
+        ranker.add_topic(topic, [{'header': f"{topic} {i}", 'summary': 'Summary.', 'url': f"https://example.com/{topic}/{i}"}
+                                 for i in range(5)])
+
+    # Wall-clock bounds depend on the machine, so the 100k-user timing is opt-in
+    benchmark = bool(os.getenv('RANKING_BENCHMARK'))
+    random.seed(0)
+    user_preferences = {f"user{i}": random.sample(topics, random.randint(1, 3))
+                        for i in range(100000 if benchmark else 1000)}
+    user_preferences['unknown'] = ['cooking']
+
+    start = time.perf_counter()
+    # Small chunks outside the benchmark so results spanning several chunks are checked too
+    ranked = ranker.rank(user_preferences, top_k=10, chunk_size=16384 if benchmark else 256)
+    elapsed = time.perf_counter() - start
+    if benchmark:
+        assert elapsed < 1.0, elapsed
+    assert ranked['unknown'] == []
+
+    for user_id in ['user0', 'user1', 'user2']:
+        interest = sum(ranker.topic_vectors[ranker.topic_ids[t]] for t in user_preferences[user_id])
+        scores = ranker.embeddings @ interest
+        expected = [i for i in np.argsort(-scores) if ranker.topics[ranker.article_topics[i][0]] in user_preferences[user_id]][:10]
+        assert ranked[user_id] == [(ranker.topics[ranker.article_topics[i][0]], ranker.articles[i]) for i in expected], user_id
+
+    # A story shared by two topics is one article: listed once, under a topic the user selected
+    shared = ranker.articles[0]
+    ranker.add_topic('sports', [shared])
+    both = ranker.rank({'both': ['general', 'sports'], 'sports_only': ['sports']})
+    assert [summary['url'] for _, summary in both['both']].count(shared['url']) == 1
+    assert ('sports', shared) in both['sports_only']
+
+    print(f"✅ Ranked {len(user_preferences)} users in {elapsed:.2f}s")
+    return True
+
+if __name__ == "__main__":
+    test_batched_ranking()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+from storage import Storage, SQLiteStorage
+
+def test_sqlite_storage():
+    """Test the local SQLite backend round-trips every kind of document"""
+    print("🧪 Testing SQLite storage...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteStorage(os.path.join(directory, 'veridian.db'))
+        try:
+            day, next_day = '2025-01-01', '2025-01-02'
+            article = {'title': 'Rates rise', 'url': 'https://example.com/rates'}
+            summary = {'header': 'Rates rise', 'summary': 'The Fed raised rates.', 'url': article['url']}
+
+            assert storage.get_raw_articles('general', day) is None
+            storage.put_raw_articles('general', day, [article])
+            assert storage.get_raw_articles('general', day) == [article]
+            storage.put_raw_articles_bulk(day, {'sports': [], 'tech': [article]})
+            assert storage.get_raw_articles_bulk(['general', 'sports', 'tech', 'science'], day) == \
+                {'general': [article], 'sports': [], 'tech': [article]}
+
+            storage.put_summaries_bulk(day, {'general': [summary], 'sports': []})
+            storage.put_summaries('general', next_day, [])
+            assert storage.get_summaries_bulk(['general', 'sports', 'tech'], day) == {'general': [summary], 'sports': []}
+            assert storage.get_summaries('general', next_day) == []
+
+            storage.put_users({'alice': {'email': 'alice@example.com', 'topics': ['general']},
+                               'bob': {'email': 'bob@example.com', 'topics': ['sports']}})
+            storage.put_users({'alice': {'topics': ['general', 'tech']}})  # Merges like Firestore
+            assert storage.get_users()['alice'] == {'email': 'alice@example.com', 'topics': ['general', 'tech']}
+            assert set(storage.get_users_bulk(['alice', 'carol'])) == {'alice'}
+
+            newsletter = {'user_id': 'alice', 'date': day, 'sections': [], 'total_articles': 0}
+            storage.put_newsletters_bulk(day, {'alice': newsletter, 'bob': {**newsletter, 'user_id': 'bob'}})
+            assert storage.get_newsletters_bulk(['alice'], day) == {'alice': newsletter}
+            storage.mark_delivered_bulk(['alice'], day)
+            assert storage.get_delivery_status(day) == {'alice': True, 'bob': False}
+            assert storage.get_delivery_status(next_day) == {}
+
+            mode = storage.connection.execute("PRAGMA journal_mode").fetchone()[0]
+            assert mode == 'wal', mode
+        finally:
+            storage.close()
+
+    class IncompleteStorage(Storage):
+        def get_users(self):
+            return {}
+
+    try:
+        IncompleteStorage()
+        assert False, "a backend missing methods should not be constructible"
+    except TypeError:
+        pass
+
+    print("✅ SQLite storage round trip passed")
+    return True
+
+if __name__ == "__main__":
+    test_sqlite_storage()